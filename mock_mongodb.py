@@ -4,10 +4,10 @@ Mock MongoDB server for testing port scanner detection capabilities.
 Implements basic MongoDB wire protocol response.
 """
 
-import socket
+import logging
 import struct
-import threading
-import sys
+
+from mockdb_server import acquire_buffer, log, main, release_buffer, serve
 
 def create_bson_response():
     """Create a MongoDB BSON response for isMaster command."""
@@ -21,83 +21,99 @@ def create_bson_response():
     )
     return bson_doc
 
+# Precompiled wire header (messageLength, requestID, responseTo, opCode)
+_HDR = struct.Struct('<iiii')
+# Precompiled OP_REPLY prefix (wire header + reply fields) and constant body
+_RESP_HDR = struct.Struct('<iiiiiqii')
+_BSON_DOC = create_bson_response()
+# responseTo is the only reply field that changes between requests
+_RESPONSE_TO = struct.Struct('<i')
+_RESPONSE_TO_OFFSET = 8
+
 def create_mongodb_response(request_id):
     """Create a complete MongoDB wire protocol response."""
-    bson_response = create_bson_response()
-    
-    # MongoDB wire protocol header
-    # messageLength (4), requestID (4), responseTo (4), opCode (4)
-    message_length = 16 + len(bson_response)  # header + bson
-    response_header = struct.pack('<i', message_length)  # Total message length
-    response_header += struct.pack('<i', 12345)          # Response ID
-    response_header += struct.pack('<i', request_id)     # Response to request ID
-    response_header += struct.pack('<i', 1)              # OP_REPLY opcode
-    
-    # OP_REPLY specific fields
-    response_flags = struct.pack('<i', 0)        # Response flags
-    cursor_id = struct.pack('<q', 0)             # Cursor ID (8 bytes)
-    starting_from = struct.pack('<i', 0)         # Starting from
-    number_returned = struct.pack('<i', 1)       # Number of documents returned
-    
-    return response_header + response_flags + cursor_id + starting_from + number_returned + bson_response
+    # Header: messageLength, requestID, responseTo, opCode (OP_REPLY)
+    # OP_REPLY: responseFlags, cursorID (8 bytes), startingFrom, numberReturned
+    return create_response_header(request_id) + _BSON_DOC
+
+def create_response_header(request_id):
+    """Create the OP_REPLY prefix that precedes the BSON document."""
+    return _RESP_HDR.pack(16 + len(_BSON_DOC), 12345, request_id, 1, 0, 0, 0, 1)
+
+def new_reply_buffer():
+    """Return a writable copy of the full reply, reused for every request on a connection."""
+    return bytearray(create_mongodb_response(0))
+
+def send_mongodb_response(client_socket, reply, request_id):
+    """Patch responseTo into a prefilled reply buffer and send it; return bytes sent.
+
+    Only the request header is needed, so short or malformed bodies still get a reply.
+    """
+    _RESPONSE_TO.pack_into(reply, _RESPONSE_TO_OFFSET, request_id)
+    client_socket.sendall(reply)
+    return len(reply)
+
+def recv_at_least(client_socket, view, have, need):
+    """Receive into ``view`` after ``have`` bytes until ``need`` are buffered.
+
+    Returns the new fill level, or 0 if the peer closed the connection.
+    """
+    while have < need:
+        n = client_socket.recv_into(view[have:])
+        if not n:
+            return 0
+        have += n
+    return have
 
 def handle_client(client_socket, address):
     """Handle individual client connections with MongoDB protocol."""
-    print(f"[MockMongoDB] Connection from {address}")
+    log.debug("[MockMongoDB] Connection from %s", address)
+    buf = acquire_buffer()
+    view = memoryview(buf)
+    reply = new_reply_buffer()
     try:
+        have = 0
         while True:
-            # Read MongoDB message header (16 bytes)
-            header_data = client_socket.recv(16)
-            if not header_data or len(header_data) < 16:
+            # Usually a single recv_into yields both the 16-byte header and the body
+            have = recv_at_least(client_socket, view, have, _HDR.size)
+            if not have:
                 break
                 
             # Parse message header
-            message_length, request_id, response_to, op_code = struct.unpack('<iiii', header_data)
-            print(f"[MockMongoDB] Message: len={message_length}, reqid={request_id}, opcode={op_code}")
+            message_length, request_id, response_to, op_code = _HDR.unpack_from(buf, 0)
+            log.debug("[MockMongoDB] Message: len=%d, reqid=%d, opcode=%d",
+                      message_length, request_id, op_code)
             
-            # Read the rest of the message
-            remaining = message_length - 16
-            if remaining > 0:
-                body_data = client_socket.recv(remaining)
-                print(f"[MockMongoDB] Body: {body_data[:50]}...")
-            
-            # Send MongoDB response
-            response = create_mongodb_response(request_id)
-            client_socket.send(response)
-            print(f"[MockMongoDB] Sent response: {len(response)} bytes")
+            # Reply to whatever body arrived; like the old recv(remaining), never wait
+            # for the full declared length, since probes often under-send or are not
+            # MongoDB at all (an HTTP request decodes to a ~542 MB length)
+            message_length = max(message_length, 16)
+            if have == 16 and message_length > 16:
+                # Header came on its own: allow one read for the body, as before
+                have += client_socket.recv_into(view[have:])
+            # Send MongoDB response; every parsed header gets one, whatever the body
+            sent = send_mongodb_response(client_socket, reply, request_id)
+
+            consumed = min(have, message_length)
+            if message_length > 16 and log.isEnabledFor(logging.DEBUG):
+                log.debug("[MockMongoDB] Body: %s...", view[16:min(consumed, 66)].tobytes())
+            log.debug("[MockMongoDB] Sent response: %d bytes", sent)
+
+            # Keep any pipelined bytes that followed this message
+            leftover = have - consumed
+            buf[:leftover] = buf[consumed:have]
+            have = leftover
             
     except Exception as e:
-        print(f"[MockMongoDB] Error handling client {address}: {e}")
+        log.debug("[MockMongoDB] Error handling client %s: %s", address, e)
     finally:
+        release_buffer(buf)
         client_socket.close()
-        print(f"[MockMongoDB] Connection closed: {address}")
+        log.debug("[MockMongoDB] Connection closed: %s", address)
 
 def start_mock_mongodb(port=27018):
     """Start the mock MongoDB server."""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    try:
-        server.bind(('127.0.0.1', port))
-        server.listen(5)
-        print(f"[MockMongoDB] Server listening on 127.0.0.1:{port}")
-        
-        while True:
-            client_socket, address = server.accept()
-            client_thread = threading.Thread(
-                target=handle_client, 
-                args=(client_socket, address),
-                daemon=True
-            )
-            client_thread.start()
-            
-    except KeyboardInterrupt:
-        print("[MockMongoDB] Server shutting down...")
-    except Exception as e:
-        print(f"[MockMongoDB] Server error: {e}")
-    finally:
-        server.close()
+    serve(port, handle_client, "MockMongoDB")
 
 if __name__ == "__main__":
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 27018
-    start_mock_mongodb(port)
\ No newline at end of file
+    main(start_mock_mongodb, 27018)
\ No newline at end of file
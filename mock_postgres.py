@@ -4,88 +4,68 @@ Mock PostgreSQL server for testing port scanner detection capabilities.
 Implements basic PostgreSQL startup handshake protocol.
 """
 
-import socket
-import struct
-import threading
-import sys
+import logging
+
+from mockdb_server import acquire_buffer, log, main, release_buffer, serve
+
+# Authentication OK (Type R, length 8, auth type 0)
+_AUTH_OK = b'R\x00\x00\x00\x08\x00\x00\x00\x00'
+
+# BackendKeyData (Type K, length 12, process_id 12345, secret_key 67890)
+_BACKEND_KEY = b'K\x00\x00\x00\x0c\x00\x00\x30\x39\x00\x01\x09\x32'
+
+# ReadyForQuery (Type Z, length 5, status I=idle)
+_READY = b'Z\x00\x00\x00\x05I'
+
+_STARTUP_RESP = _AUTH_OK + _BACKEND_KEY + _READY
+
+# ErrorResponse (Type E, length 33) sent back for any query
+_ERR_RESP = b'E\x00\x00\x00\x21PostgreSQL mock server ready\x00'
 
 def postgres_startup_response():
     """Return a PostgreSQL startup response message."""
     # PostgreSQL uses a specific format for authentication messages
     # This simulates a successful authentication challenge
-    
-    # Authentication OK (Type R, length 8, auth type 0)
-    auth_ok = b'R' + struct.pack('>I', 8) + struct.pack('>I', 0)
-    
-    # BackendKeyData (Type K, length 12, process_id, secret_key)
-    backend_key = b'K' + struct.pack('>I', 12) + struct.pack('>I', 12345) + struct.pack('>I', 67890)
-    
-    # ReadyForQuery (Type Z, length 5, status I=idle)
-    ready = b'Z' + struct.pack('>I', 5) + b'I'
-    
-    return auth_ok + backend_key + ready
+    return _STARTUP_RESP
 
 def handle_client(client_socket, address):
     """Handle individual client connections with PostgreSQL protocol."""
-    print(f"[MockPostgres] Connection from {address}")
+    log.debug("[MockPostgres] Connection from %s", address)
+    buf = acquire_buffer()
     try:
         # Read startup message
-        data = client_socket.recv(1024)
-        if not data:
+        n = client_socket.recv_into(buf)
+        if not n:
             return
             
-        print(f"[MockPostgres] Received startup: {data[:50]}...")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("[MockPostgres] Received startup: %s...", memoryview(buf)[:min(n, 50)].tobytes())
         
-        # Send authentication response
-        response = postgres_startup_response()
-        client_socket.send(response)
-        print(f"[MockPostgres] Sent auth response: {len(response)} bytes")
+        # Send authentication response (shared by every connection)
+        client_socket.sendall(_STARTUP_RESP)
+        log.debug("[MockPostgres] Sent auth response: %d bytes", len(_STARTUP_RESP))
         
         # Handle any additional queries
         while True:
-            data = client_socket.recv(1024)
-            if not data:
+            n = client_socket.recv_into(buf)
+            if not n:
                 break
-            print(f"[MockPostgres] Query received: {data[:30]}...")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("[MockPostgres] Query received: %s...", memoryview(buf)[:min(n, 30)].tobytes())
             
             # Send a simple response to any query
-            # ErrorResponse (Type E)
-            error_msg = b"PostgreSQL mock server ready"
-            error_response = b'E' + struct.pack('>I', len(error_msg) + 5) + error_msg + b'\x00'
-            client_socket.send(error_response)
+            client_socket.sendall(_ERR_RESP)
             
     except Exception as e:
-        print(f"[MockPostgres] Error handling client {address}: {e}")
+        log.debug("[MockPostgres] Error handling client %s: %s", address, e)
     finally:
+        release_buffer(buf)
         client_socket.close()
-        print(f"[MockPostgres] Connection closed: {address}")
+        log.debug("[MockPostgres] Connection closed: %s", address)
 
 def start_mock_postgres(port=5433):
     """Start the mock PostgreSQL server."""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    try:
-        server.bind(('127.0.0.1', port))
-        server.listen(5)
-        print(f"[MockPostgres] Server listening on 127.0.0.1:{port}")
-        
-        while True:
-            client_socket, address = server.accept()
-            client_thread = threading.Thread(
-                target=handle_client, 
-                args=(client_socket, address),
-                daemon=True
-            )
-            client_thread.start()
-            
-    except KeyboardInterrupt:
-        print("[MockPostgres] Server shutting down...")
-    except Exception as e:
-        print(f"[MockPostgres] Server error: {e}")
-    finally:
-        server.close()
+    serve(port, handle_client, "MockPostgres")
 
 if __name__ == "__main__":
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5433
-    start_mock_postgres(port)
\ No newline at end of file
+    main(start_mock_postgres, 5433)
\ No newline at end of file
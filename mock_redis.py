@@ -4,75 +4,167 @@ Mock Redis server for testing port scanner detection capabilities.
 Implements basic RESP protocol responses.
 """
 
-import socket
-import threading
-import sys
+import logging
+import os
+
+from mockdb_server import acquire_buffer, log, main, release_buffer, serve
+
+_PING = b'+PONG\r\n'
+_INFO = b'$158\r\n# Server\r\nredis_version:7.0.0\r\nredis_git_sha1:00000000\r\nredis_git_dirty:0\r\nredis_build_id:12345\r\nredis_mode:standalone\r\nos:Linux 5.4.0\r\narch_bits:64\r\n\r\n'
+_GET_NULL = b'$-1\r\n'  # NULL response
+_OK = b'+OK\r\n'
+_AUTH_ERR = b'-ERR AUTH <password> called without any password configured for the default user\r\n'
+_UNK = b'-ERR unknown command\r\n'
+
+def open_info_file():
+    """Back the INFO reply with an anonymous memfd so it can be sent with sendfile().
+
+    Returns None where memfd_create is unavailable; callers then send the bytes.
+    """
+    if not hasattr(os, 'memfd_create'):
+        return None
+    try:
+        fd = os.memfd_create('redis_info')
+    except OSError:
+        return None
+    info_file = os.fdopen(fd, 'w+b', buffering=0)
+    info_file.write(_INFO)
+    return info_file
+
+_INFO_FILE = open_info_file()
+
+def send_info(client_socket):
+    """Send the INFO reply from the memfd with one sendfile() call.
+
+    Falls back to sendall() if the socket buffer is full or the kernel
+    sends less than the whole reply.
+    """
+    try:
+        sent = os.sendfile(client_socket.fileno(), _INFO_FILE.fileno(), 0, len(_INFO))
+    except BlockingIOError:
+        sent = 0
+    if sent < len(_INFO):
+        client_socket.sendall(_INFO[sent:])
+
+_WHITESPACE = frozenset(b' \t\r\n')
+_LOWER = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', b'abcdefghijklmnopqrstuvwxyz')
+
+# Setting bit 0x20 in every byte folds ASCII letters to lowercase, so one
+# OR turns a verb of up to 8 bytes into a case-insensitive integer key
+_MAX_VERB = 8
+# Header and inline command lines are short; CRLF searches stop after this many bytes
+_LINE_PROBE = 64
+_CASE_FOLD = [int.from_bytes(b' ' * k, 'big') for k in range(_MAX_VERB + 1)]
+
+def verb_key(verb):
+    """Return the case-insensitive integer dispatch key for a command verb."""
+    if len(verb) > _MAX_VERB:
+        return 0
+    return int.from_bytes(verb, 'big') | _CASE_FOLD[len(verb)]
+
+_ECHO_KEY = verb_key(b'ECHO')
+
+# Constant replies keyed by command verb; ECHO is the only dynamic one
+_TABLE = {
+    verb_key(b'PING'): _PING,
+    verb_key(b'INFO'): _INFO,
+    verb_key(b'GET'): _GET_NULL,
+    verb_key(b'SET'): _OK,
+    verb_key(b'AUTH'): _AUTH_ERR,
+}
+
+def parse_command(data):
+    """Split an inline or RESP array command into (verb, argument).
+
+    ``data`` may be bytes or a memoryview starting at offset 0 of a
+    receive buffer. Both verb and argument are memoryviews into
+    ``data``, so the buffer itself is never copied.
+    """
+    mv = memoryview(data)
+    # Search the backing object directly; memoryview has no find()
+    buf = mv.obj
+    end = len(mv)
+    i = 0
+    while i < end and mv[i] in _WHITESPACE:
+        i += 1
+
+    if i < end and mv[i] == 0x2A:  # '*': array of bulk strings
+        parts = []
+        pos = buf.find(b'\r\n', i, min(end, i + _LINE_PROBE)) + 2
+        while len(parts) < 2 and 1 < pos < end and mv[pos] == 0x24:  # '$'
+            eol = buf.find(b'\r\n', pos, min(end, pos + _LINE_PROBE))
+            if eol < 0:
+                break
+            try:
+                size = int(bytes(mv[pos + 1:eol]))
+            except ValueError:
+                break
+            if size < 0:
+                break
+            parts.append(mv[eol + 2:eol + 2 + size])
+            pos = eol + 4 + size
+        verb = parts[0] if parts else mv[end:]
+        return verb, parts[1] if len(parts) > 1 else mv[end:]
+
+    # Inline command: only its first line matters; without a nearby CRLF
+    # (a long argument, or no terminator) the whole buffer is the line
+    line_end = buf.find(b'\r\n', i, min(end, i + _LINE_PROBE))
+    if line_end < 0:
+        line_end = end
+    # The verb ends at the first whitespace byte
+    verb_end = i
+    while verb_end < line_end and verb_end - i < _MAX_VERB and mv[verb_end] not in _WHITESPACE:
+        verb_end += 1
+    j = verb_end
+    while j < line_end and mv[j] in _WHITESPACE:
+        j += 1
+    k = line_end
+    while k > j and mv[k - 1] in _WHITESPACE:
+        k -= 1
+    return mv[i:verb_end], mv[j:k]
 
 def redis_response(command):
     """Return appropriate Redis RESP protocol responses."""
-    command = command.strip().upper()
-    
-    if command.startswith(b'PING'):
-        return b'+PONG\r\n'
-    elif command.startswith(b'INFO'):
-        return b'$158\r\n# Server\r\nredis_version:7.0.0\r\nredis_git_sha1:00000000\r\nredis_git_dirty:0\r\nredis_build_id:12345\r\nredis_mode:standalone\r\nos:Linux 5.4.0\r\narch_bits:64\r\n\r\n'
-    elif command.startswith(b'ECHO'):
-        msg = command[5:].strip()
-        return f'${len(msg)}\r\n'.encode() + msg + b'\r\n'
-    elif command.startswith(b'GET'):
-        return b'$-1\r\n'  # NULL response
-    elif command.startswith(b'SET'):
-        return b'+OK\r\n'
-    elif command.startswith(b'AUTH'):
-        return b'-ERR AUTH <password> called without any password configured for the default user\r\n'
-    else:
-        return b'-ERR unknown command\r\n'
+    verb, arg = parse_command(command)
+    key = verb_key(verb)
+    if key == _ECHO_KEY:
+        return f'${len(arg)}\r\n'.encode() + bytes(arg) + b'\r\n'
+    return _TABLE.get(key, _UNK)
 
 def handle_client(client_socket, address):
     """Handle individual client connections."""
-    print(f"[MockRedis] Connection from {address}")
+    log.debug("[MockRedis] Connection from %s", address)
+    buf = acquire_buffer()
     try:
         while True:
-            data = client_socket.recv(1024)
-            if not data:
+            n = client_socket.recv_into(buf)
+            if not n:
                 break
+            data = memoryview(buf)[:n]
             
-            print(f"[MockRedis] Received: {data}")
-            response = redis_response(data)
-            client_socket.send(response)
-            print(f"[MockRedis] Sent: {response}")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("[MockRedis] Received: %s", data.tobytes())
+            # Bare PING is by far the most common probe; answer it without parsing
+            # Only look at bytes received now; the pooled buffer may hold an earlier client's data
+            if n >= 4 and data[:4].tobytes().translate(_LOWER) == b'ping' and (n == 4 or data[4] in _WHITESPACE):
+                response = _PING
+            else:
+                response = redis_response(data)
+            if response is _INFO and _INFO_FILE is not None:
+                send_info(client_socket)
+            else:
+                client_socket.sendall(response)
+            log.debug("[MockRedis] Sent: %s", response)
     except Exception as e:
-        print(f"[MockRedis] Error handling client {address}: {e}")
+        log.debug("[MockRedis] Error handling client %s: %s", address, e)
     finally:
+        release_buffer(buf)
         client_socket.close()
-        print(f"[MockRedis] Connection closed: {address}")
+        log.debug("[MockRedis] Connection closed: %s", address)
 
 def start_mock_redis(port=6379):
     """Start the mock Redis server."""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    try:
-        server.bind(('127.0.0.1', port))
-        server.listen(5)
-        print(f"[MockRedis] Server listening on 127.0.0.1:{port}")
-        
-        while True:
-            client_socket, address = server.accept()
-            client_thread = threading.Thread(
-                target=handle_client, 
-                args=(client_socket, address),
-                daemon=True
-            )
-            client_thread.start()
-            
-    except KeyboardInterrupt:
-        print("[MockRedis] Server shutting down...")
-    except Exception as e:
-        print(f"[MockRedis] Server error: {e}")
-    finally:
-        server.close()
+    serve(port, handle_client, "MockRedis")
 
 if __name__ == "__main__":
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
-    start_mock_redis(port)
\ No newline at end of file
+    main(start_mock_redis, 6379)
\ No newline at end of file
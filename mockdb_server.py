@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Shared server plumbing for the mock database servers.
+Each mock supplies its protocol handler; this module handles listening,
+worker threads, receive buffers, logging and the command-line entry point.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import selectors
+import signal
+import socket
+import threading
+import sys
+
+log = logging.getLogger("mockdb")
+
+MAX_WORKERS = 64
+RECV_BUFFER_SIZE = 4096
+
+# Free list of receive buffers shared by all workers
+_BUF_POOL = queue.SimpleQueue()
+_BUF_POOL_MAX = 128
+
+def acquire_buffer():
+    """Check a receive buffer out of the shared pool, allocating if it is empty."""
+    try:
+        return _BUF_POOL.get_nowait()
+    except queue.Empty:
+        return bytearray(RECV_BUFFER_SIZE)
+
+def release_buffer(buf):
+    """Return a receive buffer to the shared pool unless it is already full."""
+    if _BUF_POOL.qsize() < _BUF_POOL_MAX:
+        _BUF_POOL.put_nowait(buf)
+
+def start_worker_pool(handle_client, workers=MAX_WORKERS):
+    """Start reusable daemon workers and return a function that dispatches to them.
+
+    When every worker is busy the connection gets its own overflow thread,
+    so a new client never waits behind long-lived ones.
+    """
+    connections = queue.SimpleQueue()
+    # One token per worker that is waiting for a connection
+    idle = threading.Semaphore(0)
+
+    def worker():
+        while True:
+            idle.release()
+            handle_client(*connections.get())
+
+    def dispatch(client_socket, address):
+        if idle.acquire(blocking=False):
+            connections.put((client_socket, address))
+        else:
+            threading.Thread(target=handle_client, args=(client_socket, address), daemon=True).start()
+
+    for _ in range(workers):
+        threading.Thread(target=worker, daemon=True).start()
+    return dispatch
+
+def serve(port, handle_client, tag):
+    """Listen on 127.0.0.1:port and pass each connection to handle_client."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Lets several processes listen on the same port; the kernel balances accepts
+    try:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except (AttributeError, OSError):
+        pass
+    dispatch = start_worker_pool(handle_client)
+    selector = selectors.DefaultSelector()
+
+    try:
+        server.bind(('127.0.0.1', port))
+        server.listen(socket.SOMAXCONN)
+        log.info("[%s] Server listening on 127.0.0.1:%d", tag, port)
+
+        server.setblocking(False)
+        selector.register(server, selectors.EVENT_READ)
+        while True:
+            selector.select()
+            # Drain every pending connection per wakeup; scanners connect in bursts
+            while True:
+                try:
+                    client_socket, address = server.accept()
+                except BlockingIOError:
+                    break
+                try:
+                    # Replies are tiny; don't let Nagle hold them back waiting for an ACK
+                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    # Some platforms let accepted sockets inherit the listener's non-blocking mode
+                    client_socket.setblocking(True)
+                except OSError:
+                    # The peer may already have reset the connection; that is not a server error
+                    client_socket.close()
+                    continue
+                dispatch(client_socket, address)
+
+    except KeyboardInterrupt:
+        log.info("[%s] Server shutting down...", tag)
+    except Exception as e:
+        log.error("[%s] Server error: %s", tag, e)
+    finally:
+        selector.close()
+        server.close()
+
+def configure_logging():
+    """Queue log records so workers never block on stderr; one thread writes them."""
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(level=os.environ.get("MOCKDB_LOG_LEVEL", "INFO"), format="%(message)s",
+                        handlers=[logging.handlers.QueueHandler(log_queue)], force=True)
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    listener.start()
+    return listener
+
+def run_server(start_server, port):
+    """Run start_server(port) in this process with its own log writer thread."""
+    listener = configure_logging()
+    try:
+        start_server(port)
+    finally:
+        listener.stop()
+
+def main(start_server, default_port):
+    """Command-line entry point: ``mock_*.py [port]``."""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else default_port
+    # MOCKDB_PROCESSES=N runs N listeners sharing the port via SO_REUSEPORT
+    processes = int(os.environ.get("MOCKDB_PROCESSES", "1"))
+    # Exit cleanly on SIGTERM so multiprocessing reaps the extra listeners
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    for _ in range(processes - 1):
+        multiprocessing.Process(target=run_server, args=(start_server, port), daemon=True).start()
+    run_server(start_server, port)